@@ -1,20 +1,46 @@
 import os
 import subprocess
-import srt
 import tkinter as tk
-from tkinter import filedialog, simpledialog, messagebox, scrolledtext
-from datetime import timedelta
+from tkinter import filedialog, simpledialog, messagebox, scrolledtext, ttk
 import requests
 import re
-import whisper
+import hashlib
+import functools
+import importlib.util
+import mmap
+import shutil
+import tempfile
+import numpy as np
 from openai import OpenAI
+# whisper / faster_whisper pull in torch or CTranslate2 (seconds and hundreds of MB), so they are imported lazily
+# by load_faster_whisper() / load_openai_whisper() and prewarmed in the background once the window is up
 import json
+try:
+    import orjson # C-accelerated JSON parser, used for reading config.json when available
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
 import sys # Import sys to check platform for ffmpeg path
 import threading # Import threading for background tasks (optional but good for GUI)
+import concurrent.futures # Thread pool for running independent FFmpeg jobs in parallel
+import collections # deque keeps only the tail of long FFmpeg logs
 import traceback # Import traceback for detailed error info
 
 # --- Configuration Handling ---
 CONFIG_FILE = "config.json"
+LLM_CACHE_DIR = "llm_cache" # On-disk cache of LLM replies keyed by prompt hash
+FFMPEG_PIPE_BUFSIZE = 1 << 20 # 1 MiB pipe buffers for FFmpeg subprocesses (default is 8 KiB)
+WHISPER_MODEL_DIR = "models" # Cache directory for int8-converted CTranslate2 Whisper models
+
+# Hardware H.264 encoders tried in order when video_encoder is 'auto':
+# (encoder, flags before the input, suffix appended to the -vf chain, quality flags)
+HW_VIDEO_ENCODERS = [
+    ("h264_nvenc", [], "", ["-preset", "p5", "-rc", "vbr", "-cq", "23"]), # NVIDIA
+    ("h264_qsv", [], "", ["-global_quality", "23"]), # Intel Quick Sync
+    ("h264_vaapi", ["-vaapi_device", "/dev/dri/renderD128"], ",format=nv12,hwupload", ["-qp", "23"]), # Linux VA-API (frames must be uploaded)
+    ("h264_videotoolbox", [], "", ["-q:v", "65"]), # macOS
+]
+MAX_BURN_FROM_SOURCE_INPUTS = 32 # Each range is a separate FFmpeg input with its own decoder, so cap how many are opened at once
 
 # 預設的 AI 提示詞模板，包含一個佔位符 {subtitle_content} 用於插入字幕內容
 DEFAULT_AI_PROMPT_TEMPLATE = """你是一位專業影片剪輯助理。
@@ -40,19 +66,53 @@ DEFAULT_CONFIG = {
     "output_dir": "out",
     "buffer_time": 0.5, # Seconds buffer before and after LLM suggested times
     "min_duration": 2.0, # Minimum duration for a clip in seconds
+    "prompt_time_decimals": 1, # Decimals of a second in the subtitle timestamps sent to the LLM (fewer tokens; timing is kept at full precision)
+    "llm_window_seconds": 600, # Split the subtitles into windows of this many seconds, one LLM call each (0 sends everything at once)
+    "llm_max_workers": 4, # Number of window LLM calls sent in parallel
+    "llm_prefetch_seconds": 600, # While Whisper transcribes, send the first N seconds of subtitles to the LLM early (0 disables)
+    "keyframe_align": True, # In 'concat'/'copy' mode, move clip starts back to the previous keyframe so stream copy cuts cleanly
+    "max_keyframe_shift": 1.0, # If any start would move by more than this (seconds), cut with 'single_pass' re-encoding instead
+    "clip_mode": "concat", # 'concat': one stream-copy FFmpeg cutting with the concat demuxer straight into the final video,
+                           # 'copy': one stream-copy FFmpeg per clip + concat,
+                           # 'segment': one stream-copy FFmpeg using the segment muxer + concat,
+                           # 'single_pass': one FFmpeg with a select filter graph writing the final video directly (re-encodes).
+                           # 'concat' and 'copy' fall back to 'single_pass' when the clips must be re-encoded
+    "use_llm_cache": True, # Reuse the stored LLM reply when the exact same prompt is sent again
+    "semantic_cache_threshold": 0.0, # Reuse a cached reply when prompt cosine similarity exceeds this (e.g. 0.97); 0 disables
+    "burn_from_source": True, # Burn subtitles while cutting the ranges from the source again (one encode generation, no decode of the merged video)
+    "soft_subtitles": False, # Add the subtitles as a selectable mov_text track with stream copy instead of burning them into the video
+    "video_encoder": "auto", # Encoder for burning in subtitles: 'auto' uses the first working hardware H.264 encoder, 'libx264' forces the CPU
+    "x264_preset": "veryfast", # libx264 preset for burning in subtitles (about 2x faster than 'medium' at a near-identical quality)
+    "x264_crf": 21, # libx264 quality (lower is better); 21 makes up for the faster preset
     "whisper_model": "small", # Whisper model size (tiny, base, small, medium, large)
+    "whisper_backend": "faster-whisper", # 'faster-whisper' (CTranslate2) or 'openai-whisper' (reference PyTorch implementation)
+    "whisper_int8": True, # Convert the Whisper checkpoint to an int8 CTranslate2 model on first run (faster-whisper only)
+    "whisper_batch_size": 16, # Batch size for batched faster-whisper inference (lower it on small GPUs, 1 disables batching)
     "ai_prompt_template": DEFAULT_AI_PROMPT_TEMPLATE # Add prompt template to config
 }
 
 app_config = DEFAULT_CONFIG.copy() # Global config dictionary
 
+_config_stamp = None # (mtime_ns, size) of config.json when it was last parsed
+
+def _config_file_stamp():
+    """Returns (mtime_ns, size) of config.json, or None if it does not exist."""
+    try:
+        st = os.stat(CONFIG_FILE)
+        return st.st_mtime_ns, st.st_size
+    except OSError:
+        return None
+
 def load_config():
-    """Loads configuration from config.json."""
-    global app_config
-    if os.path.exists(CONFIG_FILE):
-        with open(CONFIG_FILE, "r", encoding="utf-8") as f:
+    """Loads configuration from config.json (skips parsing if the file has not changed since the last load)."""
+    global app_config, _config_stamp
+    stamp = _config_file_stamp()
+    if stamp is not None and stamp == _config_stamp:
+        return # app_config already holds this file's content
+    if stamp is not None:
+        with open(CONFIG_FILE, "rb") as f:
             try:
-                loaded_config = json.load(f)
+                loaded_config = json_loads(f.read())
                 # Update default config with loaded values, keeping new default keys if they exist
                 # Special handling for prompt template to ensure newline characters are loaded correctly
                 if "ai_prompt_template" in loaded_config and isinstance(loaded_config["ai_prompt_template"], str):
@@ -63,25 +123,31 @@ def load_config():
                      if key not in loaded_config or loaded_config[key] is None: # Also handle None values
                          loaded_config[key] = value
                 app_config.update(loaded_config)
+                _config_stamp = stamp
                 print("✅ 配置載入成功")
-            except json.JSONDecodeError:
+            except json.JSONDecodeError: # orjson.JSONDecodeError is a subclass
                 print("⚠️ 無效的配置檔案，載入預設配置")
                 app_config = DEFAULT_CONFIG.copy()
+                _config_stamp = None
             except Exception as e:
                  print(f"⚠️ 載入配置時發生錯誤: {e}，載入預設配置")
                  traceback.print_exc()
                  app_config = DEFAULT_CONFIG.copy()
+                 _config_stamp = None
     else:
         print("ℹ️ 未找到配置檔案，載入預設配置")
         app_config = DEFAULT_CONFIG.copy()
+        _config_stamp = None
 
 def save_config():
     """Saves current configuration to config.json."""
-    global app_config
+    global app_config, _config_stamp
     try:
         with open(CONFIG_FILE, "w", encoding="utf-8") as f:
             # Json dump will handle escaping newlines
             json.dump(app_config, f, indent=4, ensure_ascii=False) # ensure_ascii=False keeps non-ASCII chars readable
+        # app_config already matches what was just written, so the next load_config() need not re-parse it
+        _config_stamp = _config_file_stamp()
         print("✅ 配置儲存成功")
     except IOError as e:
         messagebox.showerror("儲存錯誤", f"無法儲存配置檔案: {e}")
@@ -115,6 +181,7 @@ class SettingsWindow(tk.Toplevel):
         self.whisper_model_var = tk.StringVar(value=app_config.get("whisper_model", "small"))
         self.buffer_time_var = tk.DoubleVar(value=app_config.get("buffer_time", 0.5))
         self.min_duration_var = tk.DoubleVar(value=app_config.get("min_duration", 2.0))
+        self.soft_subtitles_var = tk.BooleanVar(value=app_config.get("soft_subtitles", False))
         # Prompt template will be handled directly with the text widget
 
 
@@ -164,6 +231,7 @@ class SettingsWindow(tk.Toplevel):
         tk.Entry(timing_frame, textvariable=self.buffer_time_var, width=8).pack(side=tk.LEFT, padx=5)
         tk.Label(timing_frame, text="最小片段時長 (秒):").pack(side=tk.LEFT, padx=5)
         tk.Entry(timing_frame, textvariable=self.min_duration_var, width=8).pack(side=tk.LEFT, padx=5)
+        tk.Checkbutton(timing_frame, text="以軟字幕嵌入 (不重新編碼)", variable=self.soft_subtitles_var).pack(side=tk.LEFT, padx=5)
 
         # --- AI Prompt Template Setting ---
         prompt_frame = tk.LabelFrame(main_frame, text="AI 提示詞模板設定 (使用 {subtitle_content} 插入字幕)")
@@ -227,6 +295,7 @@ class SettingsWindow(tk.Toplevel):
             app_config["whisper_model"] = self.whisper_model_var.get()
             app_config["buffer_time"] = buffer_time
             app_config["min_duration"] = min_duration
+            app_config["soft_subtitles"] = self.soft_subtitles_var.get()
             app_config["ai_prompt_template"] = prompt_template
 
 
@@ -265,12 +334,153 @@ class SubtitleEditorWindow(tk.Toplevel):
         self.destroy()
 
 # --- LLM Abstraction ---
-def call_llm(prompt):
-    """Calls the selected LLM with the given prompt."""
+def _llm_cache_path(llm_type, model_name, prompt):
+    """Returns the on-disk cache file for a prompt, keyed by the SHA-256 of backend + model + prompt."""
+    key = hashlib.sha256((str(llm_type) + str(model_name) + prompt).encode("utf-8")).hexdigest()
+    return os.path.join(LLM_CACHE_DIR, f"{key}.txt")
+
+def _write_llm_cache(cache_path, reply):
+    """Writes a reply to the cache atomically so concurrent or interrupted runs never see a partial file."""
+    try:
+        os.makedirs(LLM_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(reply)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"⚠️ 無法寫入 LLM 快取: {e}")
+
+# --- Semantic LLM Cache ---
+SEMANTIC_INDEX_NPY = os.path.join(LLM_CACHE_DIR, "index.npy") # (N, d) float32 matrix of normalized prompt embeddings
+SEMANTIC_INDEX_JSON = os.path.join(LLM_CACHE_DIR, "index.json") # Embedder name + per-row model tag and cache file
+_semantic_cache_lock = threading.Lock()
+_sentence_embedder = None
+_sentence_embedder_lock = threading.Lock() # Window prompts are embedded in parallel; load the model only once
+
+def _embed_prompt(prompt):
+    """Embeds a prompt, returning (embedder_name, normalized float32 vector) or (None, None) if no embedder is usable."""
+    global _sentence_embedder
+    try:
+        from sentence_transformers import SentenceTransformer
+        with _sentence_embedder_lock:
+            if _sentence_embedder is None:
+                _sentence_embedder = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+        # MiniLM truncates long inputs, so embed fixed-size pieces and average them to cover the whole prompt
+        pieces = [prompt[i:i + 500] for i in range(0, len(prompt), 500)] or [""]
+        vec = np.mean(_sentence_embedder.encode(pieces), axis=0)
+        embedder_name = "all-MiniLM-L6-v2"
+    except ImportError:
+        # Fall back to the OpenAI embedding endpoint when GPT is the configured LLM
+        if app_config.get("llm_type") != "gpt" or not app_config.get("gpt_api_key"):
+            return None, None
+        client = OpenAI(api_key=app_config.get("gpt_api_key"))
+        vec = client.embeddings.create(model="text-embedding-3-small", input=prompt).data[0].embedding
+        embedder_name = "text-embedding-3-small"
+    vec = np.asarray(vec, dtype=np.float32)
+    norm = np.linalg.norm(vec)
+    return embedder_name, (vec / norm if norm > 0 else vec)
+
+def _load_semantic_index(embedder_name):
+    """Loads the semantic index, returning (entries, matrix); an index built by another embedder is ignored."""
+    try:
+        with open(SEMANTIC_INDEX_JSON, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("embedder") == embedder_name:
+            matrix = np.load(SEMANTIC_INDEX_NPY)
+            if len(matrix) == len(meta["entries"]):
+                return meta["entries"], matrix
+    except (OSError, ValueError, KeyError):
+        pass
+    return [], None
+
+def _semantic_cache_lookup(tag, prompt, threshold):
+    """Returns (reply, embedding) where reply is the cached reply of the most similar earlier prompt above threshold."""
+    try:
+        embedder_name, vec = _embed_prompt(prompt)
+    except Exception as e:
+        print(f"⚠️ 無法計算提示詞向量，略過語意快取: {e}")
+        return None, None
+    if vec is None:
+        return None, None
+    with _semantic_cache_lock:
+        entries, matrix = _load_semantic_index(embedder_name)
+    if matrix is None or matrix.shape[1] != vec.shape[0]:
+        return None, (embedder_name, vec)
+    # Cosine similarity against every stored prompt in one BLAS call (rows are already normalized)
+    scores = matrix @ vec
+    # Only consider replies produced by the same LLM backend/model
+    scores[[entry["tag"] != tag for entry in entries]] = -1.0
+    best = int(np.argmax(scores))
+    if scores[best] >= threshold:
+        try:
+            with open(os.path.join(LLM_CACHE_DIR, entries[best]["file"]), "r", encoding="utf-8") as f:
+                print(f"⚡ 語意快取命中 (相似度 {scores[best]:.4f})，略過 API 呼叫")
+                return f.read(), (embedder_name, vec)
+        except OSError:
+            pass
+    return None, (embedder_name, vec)
+
+def _semantic_cache_add(tag, embedding, cache_path):
+    """Appends a prompt embedding and its cache file to the semantic index."""
+    embedder_name, vec = embedding
+    with _semantic_cache_lock:
+        entries, matrix = _load_semantic_index(embedder_name)
+        if matrix is not None and matrix.shape[1] != vec.shape[0]:
+            entries, matrix = [], None
+        entries.append({"tag": tag, "file": os.path.basename(cache_path)})
+        matrix = vec[None, :] if matrix is None else np.vstack([matrix, vec])
+        try:
+            os.makedirs(LLM_CACHE_DIR, exist_ok=True)
+            # np.save appends .npy to names without it, so keep the suffix on the temp file
+            tmp_npy = SEMANTIC_INDEX_NPY + ".tmp.npy"
+            np.save(tmp_npy, matrix)
+            os.replace(tmp_npy, SEMANTIC_INDEX_NPY)
+            tmp_json = SEMANTIC_INDEX_JSON + ".tmp"
+            with open(tmp_json, "w", encoding="utf-8") as f:
+                json.dump({"embedder": embedder_name, "entries": entries}, f)
+            os.replace(tmp_json, SEMANTIC_INDEX_JSON)
+        except OSError as e:
+            print(f"⚠️ 無法寫入語意快取索引: {e}")
+
+def call_llm(prompt, cache_scope=""):
+    """Calls the selected LLM with the given prompt, reusing the cached reply for identical prompts.
+
+    cache_scope identifies what the prompt covers (source video and subtitle time span); a semantic cache hit
+    must come from the same scope, since the reply's absolute time ranges only fit that part of that video."""
     llm_type = app_config.get("llm_type", "gpt")
     model_name = (app_config.get("gpt_model_name") if llm_type == "gpt"
                   else app_config.get("ollama_model_name"))
 
+    use_cache = app_config.get("use_llm_cache", True)
+    if use_cache:
+        cache_path = _llm_cache_path(llm_type, model_name, prompt)
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                print(f"⚡ 使用快取的 {llm_type.upper()} 回覆 (略過 API 呼叫)")
+                return f.read()
+        except FileNotFoundError:
+            pass # Cache miss, call the API below
+        except OSError as e:
+            print(f"⚠️ 無法讀取 LLM 快取: {e}")
+
+    # Near-identical prompts (e.g. one word of Whisper variance) can reuse an earlier reply
+    tag = f"{llm_type}:{model_name}:{cache_scope}"
+    semantic_threshold = float(app_config.get("semantic_cache_threshold", 0.0) or 0.0)
+    embedding = None
+    if use_cache and semantic_threshold > 0:
+        cached_reply, embedding = _semantic_cache_lookup(tag, prompt, semantic_threshold)
+        if cached_reply:
+            return cached_reply
+
+    reply = _request_llm(llm_type, model_name, prompt)
+    if reply and use_cache:
+        _write_llm_cache(cache_path, reply)
+        if embedding is not None:
+            _semantic_cache_add(tag, embedding, cache_path)
+    return reply
+
+def _request_llm(llm_type, model_name, prompt):
+    """Sends the prompt to the selected LLM API."""
     print(f"🤖 呼叫 {llm_type.upper()} 模型：{model_name}")
 
     try:
@@ -329,29 +539,202 @@ def call_llm(prompt):
         return None
 
 # --- Helper function for time formatting ---
-def format_timedelta_srt(td: timedelta) -> str:
-    """Formats a timedelta object into an SRT time string (HH:MM:SS,ms)."""
-    total_seconds = int(td.total_seconds())
+@functools.lru_cache(maxsize=4096)
+def format_ms_srt(total_ms: int) -> str:
+    """Formats a whole number of milliseconds into an SRT time string (HH:MM:SS,ms).
+
+    Cached: Whisper timestamps fall on a coarse grid, so the same values repeat across lines."""
+    total_seconds, milliseconds = divmod(total_ms, 1000)
     hours, remainder = divmod(total_seconds, 3600)
     minutes, seconds = divmod(remainder, 60)
-    milliseconds = td.microseconds // 1000
     # Ensure milliseconds are exactly 3 digits
     return f"{hours:02d}:{minutes:02d}:{seconds:02d},{milliseconds:03d}"
 
-# Helper function to convert HH:MM:SS.ms string to total seconds
-def hms_to_sec(hms: str) -> float:
-    """Converts HH:MM:SS.ms string to total seconds."""
+def format_seconds_srt(seconds: float) -> str:
+    """Formats float seconds into an SRT time string without building a timedelta (truncates to the millisecond)."""
+    # Round to the microsecond first, as timedelta(seconds=...) does, then truncate to the millisecond
+    return format_ms_srt(round(seconds * 1_000_000) // 1000)
+
+def format_srt_entry(index: int, start: float, end: float, text: str) -> str:
+    """Formats one SRT block (index, time line, text, blank line); index is 1-based."""
+    return f"{index}\n{format_seconds_srt(start)} --> {format_seconds_srt(end)}\n{text.strip()}\n\n"
+
+def build_srt(segments) -> str:
+    """Builds SRT content from (start, end, text) tuples, joined once instead of growing a string per segment."""
+    return "".join(format_srt_entry(i, start, end, text) for i, (start, end, text) in enumerate(segments, 1))
+
+# --- Helper function for Whisper model quantization ---
+_int8_conversion_failed = set() # Model sizes whose int8 conversion already failed in this session
+
+def ensure_int8_whisper_model(model_size: str) -> str:
+    """Converts the Whisper checkpoint to an int8 CTranslate2 model once and returns its path.
+
+    Falls back to the plain model name (downloaded by faster-whisper) if the conversion fails. A failed
+    conversion leaves a marker file next to the output directory so later sessions do not retry it;
+    delete the marker to try again."""
+    if os.path.isdir(model_size): # Already a path to a converted model
+        return model_size
+    output_dir = os.path.join(WHISPER_MODEL_DIR, f"whisper-{model_size}-int8")
+    if os.path.exists(os.path.join(output_dir, "model.bin")):
+        return output_dir
+    failed_marker = output_dir + ".failed"
+    if model_size in _int8_conversion_failed or os.path.exists(failed_marker):
+        return model_size
+    # The converter needs transformers (and its model download); without it skip straight to the default model
+    if importlib.util.find_spec("transformers") is None or importlib.util.find_spec("ctranslate2") is None:
+        _int8_conversion_failed.add(model_size)
+        return model_size
     try:
-        # Handle potential HH:MM:SS format without milliseconds
-        if '.' not in hms:
-            hms += '.000'
-        h, m, s_m = hms.split(":")
-        s, mmm = s_m.split(".")
-        return float(h) * 3600 + float(m) * 60 + float(s) + float(mmm) / 1000.0
-    except ValueError as e:
-        print(f"⚠️ 時間格式轉換錯誤：{hms} -> {e}")
-        traceback.print_exc()
-        return 0.0 # Return 0 or handle error appropriately
+        # Requires `pip install transformers` in addition to ctranslate2 (only needed for the first run)
+        from ctranslate2.converters import TransformersConverter
+        print(f"⚙️ 首次使用，將 Whisper {model_size} 轉換為 int8 模型 (僅需一次)...")
+        converter = TransformersConverter(f"openai/whisper-{model_size}",
+                                          copy_files=["tokenizer.json", "preprocessor_config.json"])
+        converter.convert(output_dir, quantization="int8", force=True)
+        print(f"✅ int8 模型已快取至：{output_dir}")
+        return output_dir
+    except Exception as e:
+        print(f"⚠️ int8 模型轉換失敗，改用預設模型: {e}")
+        _int8_conversion_failed.add(model_size)
+        try:
+            os.makedirs(WHISPER_MODEL_DIR, exist_ok=True)
+            with open(failed_marker, "w", encoding="utf-8") as f:
+                f.write(f"{e}\n")
+        except OSError:
+            pass # Still skipped for the rest of this session
+        return model_size
+
+# --- Lazy Whisper imports ---
+_whisper_import_lock = threading.Lock()
+_faster_whisper = None # (WhisperModel, BatchedInferencePipeline) once imported, (None, None) if not installed
+_openai_whisper = None # The whisper module once imported, False if not installed
+
+def load_faster_whisper():
+    """Imports faster-whisper on first use and returns (WhisperModel, BatchedInferencePipeline); either may be None."""
+    global _faster_whisper
+    with _whisper_import_lock:
+        if _faster_whisper is None:
+            try:
+                from faster_whisper import WhisperModel # CTranslate2 backend, 3-5x faster than openai-whisper
+                try:
+                    from faster_whisper import BatchedInferencePipeline # Available since faster-whisper 1.1
+                except ImportError:
+                    BatchedInferencePipeline = None
+                _faster_whisper = (WhisperModel, BatchedInferencePipeline)
+            except ImportError:
+                print("⚠️ 警告: 未安裝 faster-whisper，將改用 openai-whisper。建議執行 `pip install faster-whisper`")
+                _faster_whisper = (None, None)
+        return _faster_whisper
+
+def load_openai_whisper():
+    """Imports openai-whisper (and torch) on first use and returns the module, or None if it is not installed."""
+    global _openai_whisper
+    with _whisper_import_lock:
+        if _openai_whisper is None:
+            try:
+                import whisper
+                _openai_whisper = whisper
+            except ImportError:
+                print("⚠️ 警告: 未安裝 openai-whisper。請執行 `pip install faster-whisper` 或 `pip install openai-whisper`")
+                _openai_whisper = False
+        return _openai_whisper or None
+
+# --- Helper function for the software video encoder settings ---
+def software_video_encoder():
+    """Returns the libx264 entry (same layout as HW_VIDEO_ENCODERS) built from the x264 settings."""
+    return ("libx264", [], "", [
+        "-preset", str(app_config.get("x264_preset", "veryfast")),
+        "-crf", str(app_config.get("x264_crf", 21)),
+        # threads=0: one frame thread per core; frame threading scales better than sliced threads for throughput
+        "-x264-params", "threads=0:lookahead-threads=2:sliced-threads=0",
+    ])
+
+# --- Helper function for deleting temporary files ---
+def _silent_unlink(path: str) -> None:
+    """Deletes a file, ignoring it if it does not exist (one syscall instead of an exists check plus remove)."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"⚠️ 無法刪除臨時檔案 {path}: {e}")
+
+# Helper function to read large subtitle files through a memory map
+def read_text_mmap(path: str, encoding: str = "utf-8") -> str:
+    """Reads a text file via mmap, decoding straight from the mapped pages instead of an intermediate read buffer."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return "" # mmap cannot map an empty file
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as view:
+                return str(view, encoding)
+
+# One SRT entry: index line, "HH:MM:SS,mmm --> HH:MM:SS,mmm" line, then text up to the next blank line
+SRT_ENTRY_RE = re.compile(
+    r"^(\d+)[ \t]*\n(\d+):(\d{2}):(\d{2})[,.](\d{3})[ \t]*-->[ \t]*(\d+):(\d{2}):(\d{2})[,.](\d{3})[^\n]*(.*?)(?=\n[ \t]*\n|\n*\Z)",
+    re.MULTILINE | re.DOTALL)
+
+def parse_srt(content: str):
+    """Parses SRT text into a list of (index, start_sec, end_sec, text) tuples with a single regex scan."""
+    content = content.lstrip("\ufeff").replace("\r\n", "\n")
+    subs = []
+    for m in SRT_ENTRY_RE.finditer(content):
+        idx, sh, sm, ss, sms, eh, em, es, ems = map(int, m.group(1, 2, 3, 4, 5, 6, 7, 8, 9))
+        subs.append((idx,
+                     sh * 3600 + sm * 60 + ss + sms / 1000.0,
+                     eh * 3600 + em * 60 + es + ems / 1000.0,
+                     m.group(10).strip()))
+    return subs
+
+# Time ranges returned by the LLM, e.g. "00:01:15.500 - 00:01:22.000" or "00:01:15.5 - 00:01:22" (compiled once at import)
+TIME_RANGE_RE = re.compile(r'(\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,3}))?\s*-\s*(\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,3}))?')
+
+def prompt_time_decimals() -> int:
+    """Returns how many decimals of a second the subtitle timestamps in the LLM prompt carry (0-3)."""
+    return min(3, max(0, int(app_config.get("prompt_time_decimals", 1))))
+
+# Helper function to buffer, merge and filter the LLM time ranges
+def merge_clip_ranges(ranges, buffer_time, merge_gap, min_duration):
+    """Pads (start, end) ranges by buffer_time, merges those closer than merge_gap and drops ones shorter than min_duration.
+
+    Returns a sorted list of non-overlapping [start, end] ranges."""
+    r = np.asarray(ranges, dtype=np.float64).reshape(-1, 2)
+    starts = np.maximum(0.0, r[:, 0] - buffer_time)
+    ends = r[:, 1] + buffer_time
+    valid = ends > starts # Ensure end is after start after buffering
+    starts, ends = starts[valid], ends[valid]
+    if starts.size == 0:
+        return []
+
+    order = np.argsort(starts, kind="stable")
+    starts, ends = starts[order], ends[order]
+    # A range opens a new group when it starts after everything before it has ended (plus the merge gap)
+    running_end = np.maximum.accumulate(ends)
+    group_first = np.flatnonzero(np.concatenate(([True], starts[1:] > running_end[:-1] + merge_gap)))
+    merged_starts = starts[group_first] # Sorted, so the first start of a group is its minimum
+    merged_ends = np.maximum.reduceat(ends, group_first)
+    keep = (merged_ends - merged_starts) >= min_duration
+    return np.stack([merged_starts[keep], merged_ends[keep]], axis=1).tolist()
+
+# Helper function to build the "[HH:MM:SS.ms - HH:MM:SS.ms] text" lines sent to the LLM
+def format_subtitle_lines(starts, ends, texts, decimals=3) -> str:
+    """Formats arrays of start/end seconds and subtitle texts into prompt lines, with `decimals` digits of seconds."""
+    # Round first so e.g. 59.96s at 1 decimal carries into the minute instead of printing "60.0"
+    starts = np.round(np.asarray(starts, dtype=np.float64), decimals)
+    ends = np.round(np.asarray(ends, dtype=np.float64), decimals)
+    # Split hours/minutes/seconds for all subtitles at once; only the string formatting stays per line
+    start_h, start_rem = np.divmod(starts, 3600)
+    start_m = start_rem // 60
+    end_h, end_rem = np.divmod(ends, 3600)
+    end_m = end_rem // 60
+    start_s = starts % 60
+    end_s = ends % 60
+    seconds_format = f"0{decimals + 3 if decimals > 0 else 2}.{decimals}f" # 06.3f, 04.1f, 02.0f
+    return "".join(
+        f"[{int(sh):02}:{int(sm):02}:{ss:{seconds_format}} - {int(eh):02}:{int(em):02}:{es:{seconds_format}}] {text.strip()}\n"
+        for sh, sm, ss, eh, em, es, text in zip(start_h.tolist(), start_m.tolist(), start_s.tolist(),
+                                                 end_h.tolist(), end_m.tolist(), end_s.tolist(), texts)
+    )
 
 
 # --- Main Application Logic ---
@@ -360,7 +743,7 @@ class VideoEditorApp:
     def __init__(self, root):
         self.root = root
         self.root.title("AI 影片剪輯助手")
-        self.root.geometry("300x150")
+        self.root.geometry("300x210")
         self.root.resizable(False, False) # Prevent resizing the main window
 
         self.video_path = None
@@ -368,17 +751,40 @@ class VideoEditorApp:
         self.merged_video_path = None
         self.final_srt_path = None
         self.temp_clips = [] # List to store temporary clip paths
+        self._whisper_cache = {} # (backend, model name, int8) -> loaded Whisper model, kept between runs to skip reloading the weights
+        self._whisper_lock = threading.Lock() # Serializes model loading between worker threads
+        self._video_encoder_cache = {} # ffmpeg path -> detected video encoder entry (see HW_VIDEO_ENCODERS)
+        self._merged_duration = None # Expected length (seconds) of the merged video, for FFmpeg progress
+        self._clip_ranges = None # Source ranges the merged video was cut from, in timeline order (None if not exact)
+        # One executor per kind of work. The workflow runs one pipeline at a time and hands its heavy steps to the
+        # other two: concurrent FFmpeg processes (at most 4, beyond that they only compete for disk bandwidth)
+        # and Whisper (one worker, since a single model already saturates the GPU/CPU)
+        self._workflow_pool = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="workflow")
+        self._ff_pool = concurrent.futures.ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1), thread_name_prefix="ffmpeg")
+        self._ml_pool = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="whisper")
+        self._busy_jobs = 0 # Jobs submitted through _submit_job that have not finished yet
+        self._progress_failed = False # An FFmpeg job of the current jobs failed; its status stays shown until the next job
+        self._final_transcript = None # (clip ranges, future of segments) of the speculative merged-video transcription
+        # Popen arguments shared by every FFmpeg/ffprobe call: 1 MiB pipe buffers (fewer syscalls per MB than the
+        # default) and CREATE_NO_WINDOW to hide the console window on Windows. Computed once here.
+        self._ff_kwargs = dict(bufsize=FFMPEG_PIPE_BUFSIZE,
+                               creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0)
 
         load_config() # Load configuration at startup
+        # Import the Whisper backend while the user picks a video, so the GUI does not wait for torch/CTranslate2
+        self._ml_pool.submit(self._prewarm_whisper_import)
 
         # --- Main Window Buttons ---
         tk.Button(self.root, text="設定", command=self.open_settings).pack(pady=10)
-        tk.Button(self.root, text="選擇影片並開始處理", command=self.start_processing_workflow).pack(pady=10)
+        self.start_button = tk.Button(self.root, text="選擇影片並開始處理", command=self.start_processing_workflow)
+        self.start_button.pack(pady=10)
         tk.Button(self.root, text="離開", command=self.root.quit).pack(pady=10)
 
-        # Status label (optional, can add to show progress)
-        # self.status_label = tk.Label(self.root, text="等待操作...")
-        # self.status_label.pack(pady=5)
+        # Status label and progress bar, updated from FFmpeg's -progress output
+        self.status_label = tk.Label(self.root, text="等待操作...")
+        self.status_label.pack(pady=(5, 0))
+        self.progress_bar = ttk.Progressbar(self.root, length=260, maximum=100)
+        self.progress_bar.pack(pady=5)
 
 
     def open_settings(self):
@@ -435,8 +841,31 @@ class VideoEditorApp:
         if not self.check_configuration():
             return # Stop if config is invalid
 
-        # Start the rest of the workflow in a separate thread
-        threading.Thread(target=self._processing_workflow_thread).start()
+        # Start the rest of the workflow in a background worker
+        self._submit_job(self._processing_workflow_thread)
+
+    def _submit_job(self, fn, *args):
+        """Runs fn on the workflow executor, keeping the start button disabled while any job is running. Main thread only."""
+        if self._busy_jobs == 0:
+            self._progress_failed = False
+            self._set_progress("處理中...", 0.0)
+        self._busy_jobs += 1
+        self.start_button.config(state=tk.DISABLED)
+        future = self._workflow_pool.submit(fn, *args)
+        future.add_done_callback(lambda f: self.root.after(0, self._job_done, f))
+        return future
+
+    def _job_done(self, future):
+        """Reports a job's uncaught exception and re-enables the start button once nothing is running (main thread)."""
+        error = future.exception()
+        if error is not None:
+            print(f"❌ 背景工作發生未處理的錯誤: {error}")
+            traceback.print_exception(type(error), error, error.__traceback__)
+        self._busy_jobs -= 1
+        if self._busy_jobs == 0:
+            self.start_button.config(state=tk.NORMAL)
+            if not self._progress_failed:
+                self._set_progress("等待操作...", 0.0)
 
 
     def _processing_workflow_thread(self):
@@ -465,8 +894,8 @@ class VideoEditorApp:
         self.merged_video_path = os.path.join(self.output_dir, "final_merged.mp4") # Changed name to avoid overwriting potential final output
         self.final_srt_path = os.path.join(self.output_dir, "final_merged.srt") # SRT for the merged video
 
-        # Resume the processing workflow in the background thread
-        threading.Thread(target=self._resume_processing_after_select).start()
+        # Resume the processing workflow in the background worker
+        self._submit_job(self._resume_processing_after_select)
 
     def _resume_processing_after_select(self):
          """Continues the workflow after video selection."""
@@ -481,26 +910,87 @@ class VideoEditorApp:
     # --- The following methods are the core processing steps ---
     # They will be called sequentially (or triggered by user action like saving subtitles)
 
+    def _get_whisper_model(self, backend, whisper_model_name):
+        """Returns the Whisper model, reusing the one loaded by a previous run if the settings are unchanged."""
+        model_key = (backend, whisper_model_name, app_config.get("whisper_int8", True))
+        with self._whisper_lock:
+            model = self._whisper_cache.get(model_key)
+            if model is not None:
+                print("⚡ 重複使用已載入的 Whisper 模型")
+                return model
+
+            self._whisper_cache.clear() # Release the previous model before loading another one (only one fits in VRAM)
+            if backend == "faster-whisper":
+                use_int8 = app_config.get("whisper_int8", True)
+                model_path = ensure_int8_whisper_model(whisper_model_name) if use_int8 else whisper_model_name
+                import ctranslate2 # Installed with faster-whisper
+                if ctranslate2.get_cuda_device_count() > 0:
+                    # float16 activations use the GPU tensor cores; the weights stay int8 unless whisper_int8 is off
+                    device, compute_type = "cuda", "int8_float16" if use_int8 else "float16"
+                else:
+                    device, compute_type = "cpu", "int8" if use_int8 else "float32"
+                print(f"🖥️ Whisper 執行裝置：{device} ({compute_type})")
+                WhisperModel, _ = load_faster_whisper()
+                model = WhisperModel(model_path, device=device, compute_type=compute_type)
+            else:
+                whisper = load_openai_whisper()
+                if whisper is None:
+                    raise RuntimeError("未安裝任何 Whisper 套件 (faster-whisper 或 openai-whisper)，無法轉錄字幕")
+                model = whisper.load_model(whisper_model_name) # Picks CUDA when torch sees a GPU
+            self._whisper_cache[model_key] = model
+            return model
+
+    def _prewarm_whisper_import(self):
+        """Imports the configured Whisper backend in the background (runs once at startup)."""
+        try:
+            if app_config.get("whisper_backend", "faster-whisper") != "faster-whisper" or load_faster_whisper()[0] is None:
+                load_openai_whisper()
+        except Exception as e:
+            print(f"⚠️ 預先載入 Whisper 失敗: {e}") # The real import will report the error again when it is needed
+
+    def _transcribe_segments(self, media_path):
+        """Transcribes media (a file path or a 16 kHz mono float32 array) with the configured Whisper backend, yielding (start, end, text) tuples."""
+        whisper_model_name = app_config.get("whisper_model", "small")
+        backend = app_config.get("whisper_backend", "faster-whisper")
+        WhisperModel, BatchedInferencePipeline = load_faster_whisper() if backend == "faster-whisper" else (None, None)
+        if backend == "faster-whisper" and WhisperModel is None:
+            print("⚠️ faster-whisper 未安裝，改用 openai-whisper")
+            backend = "openai-whisper"
+        print(f"✨ 使用 Whisper 模型：{whisper_model_name} ({backend})")
+
+        model = self._get_whisper_model(backend, whisper_model_name)
+        if backend == "faster-whisper":
+            batch_size = int(app_config.get("whisper_batch_size", 16))
+            # vad_filter skips silent regions so the decoder never runs on them
+            if BatchedInferencePipeline is not None and batch_size > 1:
+                # Decode several VAD chunks per forward pass instead of one after another
+                batched_model = BatchedInferencePipeline(model=model)
+                segments, info = batched_model.transcribe(media_path, batch_size=batch_size, language="zh", vad_filter=True,
+                                                          vad_parameters=dict(min_silence_duration_ms=500))
+            else:
+                segments, info = model.transcribe(media_path, language="zh", vad_filter=True,
+                                                  vad_parameters=dict(min_silence_duration_ms=500))
+            # segments is a lazy generator: decoding happens as we iterate
+            for segment in segments:
+                yield segment.start, segment.end, segment.text
+        else:
+            # whisper.load_model puts the model on CUDA when available; FP16 halves the memory traffic there, CPU needs FP32
+            result = model.transcribe(media_path, fp16=model.device.type == "cuda", language="zh")
+            for segment in result["segments"]:
+                yield segment['start'], segment['end'], segment['text']
+
     def generate_subtitles_if_needed(self):
         """Generates initial SRT using Whisper if it doesn't exist."""
         # Use print statements for console feedback, maybe update a status label in GUI
         print("🔍 檢查原始影片字幕...")
+        prefetched = None # (cutoff_sec, future) of an LLM call already sent for the start of the video
         if not os.path.exists(self.original_srt_path):
             print("🔍 未找到原始影片字幕，使用 Whisper 產生中...")
             try:
-                whisper_model_name = app_config.get("whisper_model", "small")
-                print(f"✨ 使用 Whisper 模型：{whisper_model_name}")
-                model = whisper.load_model(whisper_model_name)
                 print("轉錄中，這可能需要一段時間...")
-                # Pass video_path directly to transcribe
-                # Use root.after for any messagebox calls from this thread
-                result = model.transcribe(self.video_path, fp16=False, language="zh")
-
+                srt_content, prefetched = self._ml_pool.submit(self._transcribe_source_video).result()
                 with open(self.original_srt_path, "w", encoding="utf-8") as f:
-                    for i, segment in enumerate(result["segments"]):
-                        start_td = timedelta(seconds=segment['start'])
-                        end_td = timedelta(seconds=segment['end'])
-                        f.write(f"{i+1}\n{format_timedelta_srt(start_td)} --> {format_timedelta_srt(end_td)}\n{segment['text'].strip()}\n\n")
+                    f.write(srt_content)
                 print(f"✅ 原始影片字幕產生完成：{self.original_srt_path}")
             except Exception as e:
                 # Use self.root.after to show error message from thread in main GUI thread
@@ -511,14 +1001,76 @@ class VideoEditorApp:
                 return
 
         # Proceed after ensuring original SRT exists
-        self.process_with_llm()
+        self.process_with_llm(prefetched)
+
+    def _transcribe_source_video(self):
+        """Transcribes the source video (runs on the Whisper executor); returns (srt_content, prefetched LLM call or None)."""
+        # Build the whole SRT in memory and write it with a single call instead of one write() per segment
+        srt_parts = []
+        prefetched = None
+        # Once the first llm_prefetch_seconds are transcribed, the LLM starts on them while Whisper continues
+        prefetch_seconds = float(app_config.get("llm_prefetch_seconds", 600) or 0)
+        prefetch_segments = []
+        for i, (start, end, text) in enumerate(self._transcribe_segments(self.video_path)):
+            srt_parts.append(format_srt_entry(i + 1, start, end, text))
+            if prefetch_seconds > 0 and prefetched is None:
+                prefetch_segments.append((start, end, text))
+                if end >= prefetch_seconds:
+                    prefetched = self._prefetch_llm(prefetch_segments)
+                    prefetch_seconds = 0 # Only one prefetch per video
+        return "".join(srt_parts), prefetched
+
+    def _prefetch_llm(self, segments):
+        """Sends the LLM request for already transcribed segments in the background; returns (cutoff_sec, future)."""
+        starts, ends, texts = zip(*segments)
+        ai_prompt = self._build_llm_prompt(format_subtitle_lines(starts, ends, texts, prompt_time_decimals()), report_errors=False)
+        if ai_prompt is None:
+            return None # process_with_llm will report the prompt problem
+        print(f"🤖 已轉錄 {ends[-1]:.0f} 秒，先將前 {len(segments)} 句字幕送交 LLM 分析 (Whisper 繼續轉錄)...")
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        prefetch_seconds = float(app_config.get("llm_prefetch_seconds", 600) or 0)
+        future = executor.submit(call_llm, ai_prompt, self._llm_cache_scope(0, prefetch_seconds))
+        executor.shutdown(wait=False) # Let the single call finish on its own
+        # Subtitles starting after the last prefetched segment still need to be sent
+        return starts[-1], future
+
+    def _llm_cache_scope(self, window_start, window_end=None):
+        """Returns the semantic cache scope of a prompt: the source video and the configured time window it covers.
+
+        The bounds come from the llm_window_seconds / llm_prefetch_seconds grid rather than the subtitle times,
+        so a re-transcription with slightly different segment timings still lands in the same scope."""
+        end = "end" if window_end is None else f"{window_end:g}"
+        return f"{os.path.abspath(self.video_path)}|{window_start:g}-{end}"
+
+    def _build_llm_prompt(self, subtitle_content, report_errors=True):
+        """Inserts the subtitle content into the configured AI prompt template; returns None if the template is invalid."""
+        # --- Use the configurable AI Prompt Template ---
+        prompt_template = app_config.get("ai_prompt_template", DEFAULT_AI_PROMPT_TEMPLATE)
+
+        # Basic check for placeholder (should be done in config check, but double check)
+        if "{subtitle_content}" not in prompt_template:
+             if report_errors:
+                 self.root.after(0, messagebox.showerror, "提示詞錯誤", "配置中的 AI 提示詞模板缺少必要的佔位符 {subtitle_content}。請檢查設定。")
+                 print("❌ AI 提示詞模板缺少佔位符，無法生成有效提示。")
+             return None
 
-    def process_with_llm(self):
-        """Reads subtitles, creates prompt, calls LLM, and initiates clipping."""
+        try:
+            # Format the final prompt by inserting the subtitle content
+            return prompt_template.format(subtitle_content=subtitle_content)
+        except Exception as e:
+            if report_errors:
+                self.root.after(0, messagebox.showerror, "提示詞格式錯誤", f"格式化 AI 提示詞失敗: {e}。請檢查提示詞模板語法。")
+                print(f"❌ 格式化 AI 提示詞失敗: {e}")
+                traceback.print_exc()
+            return None
+
+    def process_with_llm(self, prefetched=None):
+        """Reads subtitles, creates prompt, calls LLM, and initiates clipping.
+
+        prefetched is an optional (cutoff_sec, future) for an LLM call already made on the subtitles up to cutoff_sec."""
         print("🤖 準備呼叫 LLM 分析字幕...")
         try:
-            with open(self.original_srt_path, "r", encoding="utf-8") as f:
-                subs = list(srt.parse(f.read()))
+            subs = parse_srt(read_text_mmap(self.original_srt_path))
         except FileNotFoundError:
             self.root.after(0, messagebox.showerror, "檔案錯誤", f"原始字幕檔案未找到: {self.original_srt_path}")
             print(f"❌ 原始字幕檔案未找到: {self.original_srt_path}")
@@ -529,82 +1081,83 @@ class VideoEditorApp:
             return
 
 
-        字幕內容 = ""
-        for sub in subs:
-            # Format timedelta to match expected prompt format (HH:MM:SS.ms)
-            start_td = sub.start
-            end_td = sub.end
-            # Use total_seconds for accurate floating point representation
-            start_sec = start_td.total_seconds()
-            end_sec = end_td.total_seconds()
-            start_str = f"{int(start_sec // 3600):02}:{int((start_sec % 3600) // 60):02}:{start_sec % 60:06.3f}"
-            end_str = f"{int(end_sec // 3600):02}:{int((end_sec % 3600) // 60):02}:{end_sec % 60:06.3f}"
-            字幕內容 += f"[{start_str} - {end_str}] {sub.content.strip()}\n"
-
-        # --- Use the configurable AI Prompt Template ---
-        prompt_template = app_config.get("ai_prompt_template", DEFAULT_AI_PROMPT_TEMPLATE)
-
-        # Basic check for placeholder (should be done in config check, but double check)
-        if "{subtitle_content}" not in prompt_template:
-             self.root.after(0, messagebox.showerror, "提示詞錯誤", "配置中的 AI 提示詞模板缺少必要的佔位符 {subtitle_content}。請檢查設定。")
-             print("❌ AI 提示詞模板缺少佔位符，無法生成有效提示。")
-             return
-
-        try:
-            # Format the final prompt by inserting the subtitle content
-            ai_prompt = prompt_template.format(subtitle_content=字幕內容)
-        except Exception as e:
-            self.root.after(0, messagebox.showerror, "提示詞格式錯誤", f"格式化 AI 提示詞失敗: {e}。請檢查提示詞模板語法。")
-            print(f"❌ 格式化 AI 提示詞失敗: {e}")
-            traceback.print_exc()
-            return
-
-
-        ai_reply = call_llm(ai_prompt) # This call might block the thread
-
-        if not ai_reply:
-            # call_llm already shows error message
-            print("❌ 從 LLM 獲得無效回覆")
-            return
+        replies = []
+        remainder_start = 0
+        if prefetched is not None:
+            cutoff_sec, future = prefetched
+            print("⏳ 等待預先送出的 LLM 回覆...")
+            prefetched_reply = future.result()
+            if prefetched_reply:
+                replies.append(prefetched_reply)
+                subs = [sub for sub in subs if sub[1] > cutoff_sec]
+                remainder_start = float(app_config.get("llm_prefetch_seconds", 600) or 0)
+            else:
+                print("⚠️ 預先送出的 LLM 呼叫失敗，改為送出完整字幕")
+
+        if subs:
+            # Split long videos into fixed time windows: smaller prompts, and the windows are sent in parallel
+            window_seconds = float(app_config.get("llm_window_seconds", 600) or 0)
+            windows = []
+            for sub in subs:
+                # Windows sit on a fixed grid from the start of the video, which also keeps their cache scopes stable
+                window_id = int(sub[1] // window_seconds) if window_seconds > 0 else 0
+                if not windows or windows[-1][0] != window_id:
+                    windows.append((window_id, []))
+                windows[-1][1].append(sub)
+
+            ai_prompts = []
+            cache_scopes = []
+            for window_id, window_subs in windows:
+                _, starts, ends, texts = zip(*window_subs)
+                ai_prompt = self._build_llm_prompt(format_subtitle_lines(starts, ends, texts, prompt_time_decimals()))
+                if ai_prompt is None:
+                    return
+                ai_prompts.append(ai_prompt)
+                if window_seconds > 0:
+                    cache_scopes.append(self._llm_cache_scope(window_id * window_seconds, (window_id + 1) * window_seconds))
+                else:
+                    cache_scopes.append(self._llm_cache_scope(remainder_start))
+
+            if len(ai_prompts) > 1:
+                print(f"🤖 字幕分為 {len(ai_prompts)} 個時間區段，平行送交 LLM 分析...")
+            max_workers = max(1, int(app_config.get("llm_max_workers", 4)))
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+                window_replies = list(executor.map(call_llm, ai_prompts, cache_scopes)) # These calls might block the thread
+
+            for window_index, ai_reply in enumerate(window_replies):
+                if not ai_reply:
+                    # call_llm already prints the error
+                    print(f"⚠️ 第 {window_index + 1} 個時間區段從 LLM 獲得無效回覆，略過此區段")
+                    continue
+                replies.append(ai_reply)
+
+            if not replies:
+                print("❌ 從 LLM 獲得無效回覆")
+                return
 
+        # Time ranges are absolute, so the replies for the prefetched part and every window can simply be joined
+        ai_reply = "\n".join(replies)
         print("🤖 AI 回應如下：\n", ai_reply)
 
         # --- START: Integrate time range processing from 4o.py ---
         print("⏳ 處理 AI 回應時間段，合併重疊/相近區段...")
-        matches = re.findall(r'(\d{2}:\d{2}:\d{2}\.\d{3})\s*-\s*(\d{2}:\d{2}:\d{2}\.\d{3})', ai_reply)
+        # Convert each "HH:MM:SS[.fff] - HH:MM:SS[.fff]" match straight to (start_sec, end_sec), parsing every field once
+        matches = []
+        for m in TIME_RANGE_RE.finditer(ai_reply):
+            # The fraction may have 0-3 digits depending on prompt_time_decimals; pad it to milliseconds
+            sh, sm, ss, sms, eh, em, es, ems = (int((g or "").ljust(3, "0")) if i in (3, 7) else int(g)
+                                                for i, g in enumerate(m.groups()))
+            matches.append((sh * 3600 + sm * 60 + ss + sms / 1000.0, eh * 3600 + em * 60 + es + ems / 1000.0))
 
         if not matches:
             self.root.after(0, messagebox.showwarning, "AI 警告", "AI 沒有回傳任何有效片段時間範圍。請檢查 LLM 回應格式是否正確。")
             print("⚠️ AI 沒有回傳任何有效片段")
             return
 
-        # Sort matches by start time
-        matches = sorted(matches, key=lambda x: hms_to_sec(x[0]))
-
-        buffered_ranges = []
         buffer_time = app_config.get("buffer_time", 0.5)
-        for start_str, end_str in matches:
-            start_sec = max(0, hms_to_sec(start_str) - buffer_time)
-            end_sec = hms_to_sec(end_str) + buffer_time
-            if end_sec > start_sec: # Ensure end is after start after buffering
-                buffered_ranges.append([start_sec, end_sec])
-
-        # Sort buffered ranges by start time (redundant if matches were sorted, but safe)
-        buffered_ranges = sorted(buffered_ranges, key=lambda x: x[0])
-
-        merged_ranges = []
         merge_gap = 0.5 # Gap for merging adjacent clips (can be added to config later)
-        for start, end in buffered_ranges:
-            # Merge overlapping or adjacent (gap <= merge_gap) segments
-            if not merged_ranges or start > merged_ranges[-1][1] + merge_gap:
-                merged_ranges.append([start, end])
-            else:
-                # Extend the end time of the last merged range
-                merged_ranges[-1][1] = max(merged_ranges[-1][1], end)
-
-        # Filter merged ranges by minimum duration
         min_duration = app_config.get("min_duration", 2.0)
-        final_clip_ranges = [[start, end] for start, end in merged_ranges if end - start >= min_duration]
+        final_clip_ranges = merge_clip_ranges(matches, buffer_time, merge_gap, min_duration)
 
         if not final_clip_ranges:
             self.root.after(0, messagebox.showwarning, "剪輯警告", "經過處理與合併後，沒有符合最小時長條件的剪輯片段。請檢查 AI 回應或調整設定 (緩衝時間/最小時長)。")
@@ -621,79 +1174,406 @@ class VideoEditorApp:
 
     def clip_videos(self, clip_ranges):
         """Clips video segments based on the processed ranges."""
-        clip_list_path = os.path.join(self.output_dir, "list.txt")
-        # Clear or create list.txt before clipping
-        with open(clip_list_path, "w", encoding="utf-8") as list_file:
-            pass
+        self._merged_duration = sum(end - start for start, end in clip_ranges)
+        self._clip_ranges = clip_ranges
+        self._final_transcript = None # Drop any speculative transcription from a previous video
+        clip_mode = app_config.get("clip_mode", "concat")
+        if clip_mode == "single_pass":
+            self._start_final_transcription()
+            self._clip_single_pass(clip_ranges)
+            return
+
+        # Stream copy can only start a clip on a keyframe; anything before it becomes frozen frames or silence
+        if clip_mode in ("concat", "copy"):
+            aligned = False
+            if app_config.get("keyframe_align", True):
+                clip_ranges, needs_reencode, aligned = self._align_to_keyframes(clip_ranges)
+                self._merged_duration = sum(end - start for start, end in clip_ranges)
+                if needs_reencode:
+                    # The clips have to be re-encoded anyway, so cut and join them all in one FFmpeg run
+                    # instead of spawning one encoder per clip plus a concat pass
+                    self._clip_ranges = clip_ranges
+                    self._start_final_transcription()
+                    self._clip_single_pass(clip_ranges)
+                    return
+            if aligned:
+                self._clip_ranges = clip_ranges # The merged video starts each clip at the aligned keyframe
+                self._start_final_transcription()
+            else:
+                # Unaligned stream copy still starts each clip at the previous keyframe, so the merged timeline
+                # is not known exactly: no speculative transcript or re-cut from the source
+                self._clip_ranges = None
+
+        if clip_mode == "concat":
+            self._clip_with_concat_demuxer(clip_ranges)
+            return
 
         print("✂️ 開始剪輯片段...")
-        self.temp_clips = [] # Reset temp clips list for the new batch of clips
-        successful_clips_count = 0
-
-        # Iterate over the final_clip_ranges (merged and filtered)
-        for i, (start, end) in enumerate(clip_ranges):
-            duration = end - start
-            clip_name = f"clip_{i:03d}.mp4"
-            output_clip = os.path.join(self.output_dir, clip_name)
+        if clip_mode == "segment":
+            self._clip_ranges = None # The segment muxer moves the cuts to keyframes, so the merged timeline is not known exactly
+            succeeded = self._clip_with_segment_muxer(clip_ranges)
+        else:
             # temp_clips will track all intended clip paths for cleanup
-            self.temp_clips.append(output_clip)
+            self.temp_clips = [os.path.join(self.output_dir, f"clip_{i:03d}.mp4") for i in range(len(clip_ranges))]
+            codec_flags = ["-c:v", "copy", "-c:a", "copy"] # Copy streams (no re-encoding)
 
             # FFmpeg command to clip - Using parameters from 4o.py
+            # Only the start, duration and output differ between clips, so the rest is bound once here
             # -ss and -t BEFORE -i, plus timestamp reset flags
-            cmd = [
+            cmd_template = [
                 self.ffmpeg_path,
-                "-ss", f"{start:.3f}", # Start time (seconds, .ms)
-                "-t",  f"{duration:.3f}", # Duration (seconds, .ms)
+                "-hide_banner", "-loglevel", "error", # Errors only: less stderr to pipe back per clip
+                "-ss", None, # Start time (seconds, .ms), filled in per clip
+                "-t",  None, # Duration (seconds, .ms), filled in per clip
                 "-i",  self.video_path,  # Input original video
                 "-reset_timestamps", "1", # Reset timestamps to start from 0
                 "-avoid_negative_ts", "make_zero", # Handle potential negative timestamps
-                "-c:v", "copy", # Copy video stream (no re-encoding)
-                "-c:a", "copy", # Copy audio stream (no re-encoding)
-                output_clip,
+                *codec_flags,
+                None, # Output clip, filled in per clip
                 "-y" # Overwrite output file without asking
             ]
-            print(f"  - 剪輯 {clip_name} (時間段: {start:.3f}s - {end:.3f}s, 時長: {duration:.3f}s)")
 
-            try:
-                # Adding creationflags=subprocess.CREATE_NO_WINDOW hides console window on Windows
-                # Use capture_output=True and text=True with encoding="utf-8" for better error handling
-                # Need to ensure this doesn't block the main thread if run directly
-                # This method is called from a background thread, so subprocess.run is OK here.
-                process = subprocess.run(cmd, capture_output=True, text=True, encoding="utf-8", creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0)
-
-                if process.returncode != 0:
-                    print(f"❌ FFmpeg 剪輯 {clip_name} 失敗 (返回碼: {process.returncode}):")
-                    print(process.stderr) # stderr is already text=True and decoded as utf-8
-                    self.root.after(0, messagebox.showwarning, "剪輯失敗", f"剪輯片段 {clip_name} 失敗，請檢查控制台輸出。\n錯誤碼: {process.returncode}")
-                    # Do NOT write to list.txt if failed
-                else:
-                    # Clip succeeded, append to list.txt
-                    with open(clip_list_path, "a", encoding="utf-8") as list_file:
-                         list_file.write(f"file '{os.path.basename(output_clip)}'\n") # Write just the filename
-                    successful_clips_count += 1
-
-
-            except Exception as e:
-                print(f"❌ 剪輯片段 {i+1} 過程中發生錯誤: {e}")
-                traceback.print_exc() # Print detailed error info
-                self.root.after(0, messagebox.showwarning, "剪輯錯誤", f"剪輯片段 {clip_name} 過程中發生錯誤: {e}")
-                # Continue to the next clip
+            # Stream copy barely uses the CPU, so each FFmpeg mostly waits on I/O: the FFmpeg pool overlaps them
+            clip_paths = {} # clip index -> output path, for the clips that succeeded
+            futures = {self._ff_pool.submit(self._clip_one, cmd_template, i, start, end, output_clip): i
+                       for i, ((start, end), output_clip) in enumerate(zip(clip_ranges, self.temp_clips))}
+            for future in concurrent.futures.as_completed(futures):
+                ok, output_clip, stderr = future.result()
+                if ok:
+                    clip_paths[futures[future]] = output_clip
+            # Clips finish in any order; sort by index so the concat list keeps the timeline order
+            succeeded = [clip_paths[i] for i in sorted(clip_paths)]
+            if len(clip_paths) < len(clip_ranges):
+                # The merged video leaves the failed clips out: the recorded ranges must too, and the speculative
+                # transcript (which includes their audio) no longer matches it
+                if self._clip_ranges is not None: # None stays None: the timeline was not exact to begin with
+                    self._clip_ranges = [clip_ranges[i] for i in sorted(clip_paths)]
+                self._merged_duration = sum(end - start for start, end in self._clip_ranges)
+                if self._final_transcript is not None:
+                    self._final_transcript[1].cancel()
+                    self._final_transcript = None
+        successful_clips_count = len(succeeded)
+
+        # The concat list only lists the successful clips; it is handed to FFmpeg on stdin, never written to disk
+        clip_list_entries = ["file '" + os.path.abspath(output_clip).replace("'", "'\\''") + "'" for output_clip in succeeded]
 
         # After the loop, check if any clips were successfully added to the list
-        if successful_clips_count == 0 or not os.path.exists(clip_list_path) or os.stat(clip_list_path).st_size == 0:
+        if successful_clips_count == 0:
             self.root.after(0, messagebox.showwarning, "剪輯警告", "沒有成功生成任何剪輯片段，無法合併。請檢查控制台輸出的錯誤訊息。")
             print("⚠️ 沒有成功生成任何剪輯片段，無法合併。")
             self.cleanup_temp_clips() # Clean up any partially created files
         else:
             print(f"✅ 成功生成 {successful_clips_count} 個剪輯片段。")
-            self.concatenate_clips(clip_list_path) # Proceed to concatenate
+            self.concatenate_clips(clip_list_entries) # Proceed to concatenate
+
+    def _run_ffmpeg(self, cmd, *, check=False, input=None, text=True, capture=True):
+        """Runs an FFmpeg command to completion and returns the CompletedProcess. Every FFmpeg call site goes through here.
+
+        Output is captured as UTF-8 text (raw bytes if text=False, discarded if capture=False) through the
+        shared self._ff_kwargs. `input` is written to FFmpeg's stdin (pipe:0)."""
+        output = subprocess.PIPE if capture else subprocess.DEVNULL
+        return subprocess.run(cmd, check=check, stdout=output, stderr=output, input=input,
+                              text=text, encoding="utf-8" if text else None, **self._ff_kwargs)
+
+    def _start_final_transcription(self):
+        """Speculatively transcribes the merged video's audio, cut straight from the source, while the video is being merged.
+
+        generate_final_subtitles uses the result if the clip ranges are still the same; otherwise it is ignored."""
+        self._final_transcript = None
+        if not self._clip_ranges:
+            return
+        clip_ranges = [tuple(clip_range) for clip_range in self._clip_ranges]
+        print("⚡ 預先轉錄合併後影片的音訊...")
+        future = self._ml_pool.submit(
+            lambda: list(self._transcribe_segments(self._load_audio_16k(self.video_path, clip_ranges))))
+        self._final_transcript = (clip_ranges, future)
+
+    def _run_ffmpeg_with_progress(self, cmd, stage, total_seconds=None, check=False, input=None):
+        """Runs a long FFmpeg job on the FFmpeg executor and waits for it. Returns a CompletedProcess."""
+        return self._ff_pool.submit(self._stream_ffmpeg_progress, cmd, stage, total_seconds, check, input).result()
+
+    def _stream_ffmpeg_progress(self, cmd, stage, total_seconds, check, input):
+        """Runs an FFmpeg command, streaming its -progress output to the status bar. Returns a CompletedProcess.
+
+        Unlike _run_ffmpeg, stderr is never buffered whole: a reader thread keeps only its last lines,
+        so memory stays bounded however long the encode runs."""
+        cmd = [cmd[0], "-progress", "pipe:1", "-nostats", *cmd[1:]] # Machine-readable key=value progress on stdout
+        process = subprocess.Popen(cmd, stdin=subprocess.PIPE if input is not None else subprocess.DEVNULL,
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   text=True, encoding="utf-8", errors="replace", **self._ff_kwargs)
+        stderr_tail = collections.deque(maxlen=50)
+        stderr_reader = threading.Thread(target=stderr_tail.extend, args=(process.stderr,), daemon=True)
+        stderr_reader.start()
+        if input is not None:
+            try:
+                process.stdin.write(input) # FFmpeg reads the whole (small) concat list before producing any output
+                process.stdin.close()
+            except (BrokenPipeError, OSError):
+                pass # FFmpeg exited early (bad arguments, missing file); its return code and stderr report why below
+
+        for line in process.stdout:
+            key, _, value = line.strip().partition("=")
+            # Older FFmpeg builds only write out_time_ms, which (despite its name) is also in microseconds
+            if key in ("out_time_us", "out_time_ms") and value.isdigit():
+                self._report_progress(stage, int(value) / 1e6, total_seconds)
+        process.wait()
+        stderr_reader.join()
+        if process.returncode == 0:
+            self._report_progress(stage, total_seconds, total_seconds)
+        else:
+            # Keep the failure visible until the next job starts (see _job_done)
+            self._progress_failed = True
+            self.root.after(0, self._set_progress, f"{stage}：失敗", 0.0)
+
+        stderr = "".join(stderr_tail)
+        if check and process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, cmd, stderr=stderr)
+        return subprocess.CompletedProcess(cmd, process.returncode, "", stderr)
+
+    def _report_progress(self, stage, done_seconds, total_seconds):
+        """Shows FFmpeg progress in the main window; safe to call from worker threads."""
+        if total_seconds:
+            percent = min(100.0, 100.0 * (done_seconds or 0) / total_seconds)
+            text = f"{stage}：{percent:.0f}%"
+        else:
+            percent = 0.0
+            text = f"{stage}：{done_seconds or 0:.0f}s"
+        self.root.after(0, self._set_progress, text, percent)
+
+    def _set_progress(self, text, percent):
+        """Updates the status label and progress bar (main thread only)."""
+        self.status_label.config(text=text)
+        self.progress_bar["value"] = percent
+
+    def _load_audio_16k(self, media_path, clip_ranges=None):
+        """Decodes the media's audio to a 16 kHz mono float32 array, the input format both Whisper backends expect.
+
+        With clip_ranges, only those ranges are kept and joined, giving the audio of the merged video."""
+        range_filter = []
+        if clip_ranges:
+            between = "+".join(f"between(t,{start:.3f},{end:.3f})" for start, end in clip_ranges)
+            range_filter = ["-af", f"aselect='{between}',asetpts=N/SR/TB"]
+        cmd = [
+            self.ffmpeg_path,
+            "-hide_banner", "-loglevel", "error", # Errors only
+            "-i", media_path,
+            "-vn", # Skip the video stream entirely
+            *range_filter,
+            "-ac", "1", "-ar", "16000", # Mono, 16 kHz
+            "-f", "s16le", "-" # Raw 16-bit PCM on stdout
+        ]
+        process = self._run_ffmpeg(cmd, check=True, text=False)
+        return np.frombuffer(process.stdout, np.int16).astype(np.float32) / 32768.0
+
+    def _clip_single_pass(self, clip_ranges):
+        """Cuts and joins all ranges in one FFmpeg run using a select/aselect filter graph (re-encodes the video)."""
+        print(f"✂️ 單次處理模式：以一個 FFmpeg 程序剪輯並合併 {len(clip_ranges)} 個片段...")
+        self.merged_video_path = os.path.join(self.output_dir, "final_merged.mp4") # Ensure path is set
+
+        # Keep every frame/sample whose timestamp falls in one of the ranges, then rebuild continuous timestamps
+        between = "+".join(f"between(t,{start:.3f},{end:.3f})" for start, end in clip_ranges)
+        filter_graph = (f"[0:v]select='{between}',setpts=N/FRAME_RATE/TB[v];"
+                        f"[0:a]aselect='{between}',asetpts=N/SR/TB[a]")
+        cmd = [
+            self.ffmpeg_path,
+            "-hide_banner", "-loglevel", "error", # Errors only
+            "-i", self.video_path, # The source is opened and demuxed once for all ranges
+            "-filter_complex", filter_graph,
+            "-map", "[v]", "-map", "[a]",
+            "-c:v", "libx264", "-preset", "veryfast", "-crf", "22", # Filtering requires re-encoding
+            "-c:a", "aac",
+            self.merged_video_path,
+            "-y" # Overwrite output file without asking
+        ]
+        try:
+            process = self._run_ffmpeg_with_progress(cmd, "剪輯合併", self._merged_duration)
+            if process.returncode != 0:
+                self.root.after(0, messagebox.showerror, "FFmpeg 剪輯錯誤", f"單次剪輯失敗 (返回碼: {process.returncode}):\n{process.stderr[-1000:]}")
+                print(f"❌ 單次剪輯失敗 (返回碼: {process.returncode}):\n{process.stderr}")
+                return
+        except Exception as e:
+            self.root.after(0, messagebox.showerror, "剪輯錯誤", f"單次剪輯過程中發生錯誤: {e}")
+            print(f"❌ 單次剪輯過程中發生錯誤: {e}")
+            traceback.print_exc() # Print detailed error info
+            return
+
+        print(f"🎉 剪輯與合併完成！輸出影片：{self.merged_video_path}")
+        # No temporary clips exist in this mode, go straight to the final subtitles
+        self.generate_final_subtitles()
+
+    def _clip_with_concat_demuxer(self, clip_ranges):
+        """Cuts and joins all ranges in one stream-copy FFmpeg run, writing the final video directly.
+
+        The concat demuxer reads the source once per range between inpoint/outpoint, so no clip files
+        or separate concat pass are needed. The list is passed to FFmpeg on stdin."""
+        print(f"✂️ 開始剪輯片段：以一個 FFmpeg 程序直接剪輯並合併 {len(clip_ranges)} 個片段...")
+        self.merged_video_path = os.path.join(self.output_dir, "final_merged.mp4") # Ensure path is set
+
+        # Single quotes inside a concat list path are written as '\''
+        source = os.path.abspath(self.video_path).replace("'", "'\\''")
+        concat_list = "".join(f"file '{source}'\ninpoint {start:.3f}\noutpoint {end:.3f}\n" for start, end in clip_ranges)
+        cmd = [
+            self.ffmpeg_path,
+            "-hide_banner", "-loglevel", "error", # Errors only
+            "-f", "concat", "-safe", "0", # -safe 0 allows absolute paths in the list
+            "-protocol_whitelist", "file,pipe",
+            "-i", "pipe:0", # Read the list from stdin
+            "-c:v", "copy", "-c:a", "copy", # Copy streams (no re-encoding)
+            "-avoid_negative_ts", "make_zero", # Handle potential negative timestamps
+            self.merged_video_path,
+            "-y" # Overwrite output file without asking
+        ]
+        try:
+            process = self._run_ffmpeg_with_progress(cmd, "剪輯合併", self._merged_duration, input=concat_list)
+            if process.returncode != 0:
+                self.root.after(0, messagebox.showerror, "FFmpeg 剪輯錯誤", f"剪輯合併失敗 (返回碼: {process.returncode}):\n{process.stderr[-1000:]}")
+                print(f"❌ 剪輯合併失敗 (返回碼: {process.returncode}):\n{process.stderr}")
+                return
+        except Exception as e:
+            self.root.after(0, messagebox.showerror, "剪輯錯誤", f"剪輯合併過程中發生錯誤: {e}")
+            print(f"❌ 剪輯合併過程中發生錯誤: {e}")
+            traceback.print_exc() # Print detailed error info
+            return
 
+        print(f"🎉 剪輯與合併完成！輸出影片：{self.merged_video_path}")
+        # No temporary clips exist in this mode, go straight to the final subtitles
+        self.generate_final_subtitles()
+
+    def _clip_with_segment_muxer(self, clip_ranges):
+        """Splits the video at every range boundary with one stream-copy FFmpeg run; returns the kept segment paths."""
+        # Boundaries s0,e0,s1,e1,... turn the video into alternating drop/keep segments
+        segment_times = [t for start, end in clip_ranges for t in (start, end)]
+        # Segment 0 is the part before s0 and is dropped, unless the first range starts at 0
+        first_kept = 1
+        if segment_times[0] <= 0:
+            segment_times.pop(0)
+            first_kept = 0
+
+        segment_pattern = os.path.join(self.output_dir, "seg_%03d.mp4")
+        all_segments = [segment_pattern % i for i in range(len(segment_times) + 1)]
+        self.temp_clips = all_segments # Every segment (kept or dropped) is temporary
+
+        cmd = [
+            self.ffmpeg_path,
+            "-i", self.video_path,
+            "-map", "0:v:0", "-map", "0:a:0?",
+            "-c:v", "copy", "-c:a", "copy", # With stream copy the muxer can only split on the next keyframe
+            "-f", "segment",
+            "-segment_times", ",".join(f"{t:.3f}" for t in segment_times),
+            "-reset_timestamps", "1",
+            segment_pattern,
+            "-y" # Overwrite output files without asking
+        ]
+        print(f"  - 以分段模式一次切出 {len(clip_ranges)} 個片段 ({len(segment_times)} 個切點)")
+        try:
+            process = self._run_ffmpeg(cmd)
+            if process.returncode != 0:
+                print(f"❌ FFmpeg 分段剪輯失敗 (返回碼: {process.returncode}):")
+                print(process.stderr)
+                return []
+        except Exception as e:
+            print(f"❌ 分段剪輯過程中發生錯誤: {e}")
+            traceback.print_exc() # Print detailed error info
+            return []
+
+        kept_segments = all_segments[first_kept::2][:len(clip_ranges)]
+        return [path for path in kept_segments if os.path.exists(path)]
+
+    def _ffprobe_path(self):
+        """Returns the ffprobe executable that ships next to the configured FFmpeg, or the one on PATH."""
+        ffmpeg_dir, ffmpeg_name = os.path.split(self.ffmpeg_path)
+        candidate = os.path.join(ffmpeg_dir, ffmpeg_name.replace("ffmpeg", "ffprobe"))
+        if candidate != self.ffmpeg_path and os.path.exists(candidate):
+            return candidate
+        return shutil.which("ffprobe")
+
+    def _probe_keyframes(self):
+        """Returns a sorted array of the video's keyframe timestamps, or None if ffprobe is unavailable or fails."""
+        ffprobe_path = self._ffprobe_path()
+        if not ffprobe_path:
+            print("⚠️ 找不到 ffprobe，略過關鍵幀對齊")
+            return None
+        # Reading packet flags needs no decoding, unlike -show_frames
+        cmd = [ffprobe_path, "-v", "error", "-select_streams", "v:0",
+               "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", self.video_path]
+        try:
+            process = self._run_ffmpeg(cmd)
+        except Exception as e:
+            print(f"⚠️ ffprobe 執行失敗，略過關鍵幀對齊: {e}")
+            return None
+        if process.returncode != 0:
+            print(f"⚠️ ffprobe 執行失敗，略過關鍵幀對齊:\n{process.stderr}")
+            return None
+        keyframes = []
+        for line in process.stdout.splitlines():
+            pts_time, _, flags = line.partition(",")
+            if "K" in flags and pts_time not in ("", "N/A"):
+                keyframes.append(float(pts_time))
+        return np.sort(np.array(keyframes)) if keyframes else None
+
+    def _align_to_keyframes(self, clip_ranges):
+        """Moves each clip start back to the previous keyframe so stream copy cuts cleanly.
+
+        Returns (ranges, needs_reencode, aligned); needs_reencode is True if some start would move by more than
+        max_keyframe_shift seconds (long GOP), in which case the original ranges are returned unchanged.
+        aligned is False if the keyframes could not be probed (ranges unchanged).
+        Ranges that overlap once their start is moved back are merged."""
+        keyframes = self._probe_keyframes()
+        if keyframes is None:
+            return clip_ranges, False, False
+        starts = np.array([start for start, _ in clip_ranges])
+        prev_idx = np.searchsorted(keyframes, starts, side="right") - 1
+        aligned_starts = np.where(prev_idx >= 0, keyframes[np.maximum(prev_idx, 0)], 0.0)
+        shifts = starts - aligned_starts
+        max_shift = float(app_config.get("max_keyframe_shift", 1.0))
+        if np.any(shifts > max_shift):
+            print(f"⚠️ 關鍵幀間距過大 (最多需提前 {shifts.max():.2f}s)，改以重新編碼方式精確剪輯")
+            return clip_ranges, True, False
+        print(f"✅ 已將片段起點對齊至關鍵幀 (平均提前 {shifts.mean():.2f}s)")
+        # A start moved back past the previous range's end would play that footage twice, so merge such ranges
+        aligned_ranges = []
+        for aligned, (_, end) in zip(aligned_starts.tolist(), clip_ranges):
+            if aligned_ranges and aligned <= aligned_ranges[-1][1]:
+                aligned_ranges[-1][1] = max(aligned_ranges[-1][1], end)
+            else:
+                aligned_ranges.append([aligned, end])
+        return aligned_ranges, False, True
+
+    def _clip_one(self, cmd_template, i, start, end, output_clip):
+        """Clips a single range with the given FFmpeg command template. Runs in a worker thread.
+
+        Returns (ok, output_clip, stderr)."""
+        duration = end - start
+        clip_name = os.path.basename(output_clip)
+
+        # Clips run in parallel, so each one fills in its own shallow copy of the shared template
+        cmd = cmd_template.copy()
+        cmd[5] = f"{start:.3f}"
+        cmd[7] = f"{duration:.3f}"
+        cmd[-2] = output_clip
+        print(f"  - 剪輯 {clip_name} (時間段: {start:.3f}s - {end:.3f}s, 時長: {duration:.3f}s)")
+
+        try:
+            process = self._run_ffmpeg(cmd)
+
+            if process.returncode != 0:
+                print(f"❌ FFmpeg 剪輯 {clip_name} 失敗 (返回碼: {process.returncode}):")
+                print(process.stderr) # stderr is already text=True and decoded as utf-8
+                self.root.after(0, messagebox.showwarning, "剪輯失敗", f"剪輯片段 {clip_name} 失敗，請檢查控制台輸出。\n錯誤碼: {process.returncode}")
+                return False, output_clip, process.stderr
+            return True, output_clip, process.stderr
+
+        except Exception as e:
+            print(f"❌ 剪輯片段 {i+1} 過程中發生錯誤: {e}")
+            traceback.print_exc() # Print detailed error info
+            self.root.after(0, messagebox.showwarning, "剪輯錯誤", f"剪輯片段 {clip_name} 過程中發生錯誤: {e}")
+            return False, output_clip, str(e)
 
-    def concatenate_clips(self, clip_list_path):
-        """Concatenates the clipped video segments."""
+    def concatenate_clips(self, clip_list_entries):
+        """Concatenates the clipped video segments. clip_list_entries are concat list lines ("file '...'"), fed via stdin."""
         print("🚀 合併剪輯片段中...")
-        # Ensure clip_list_path exists and is not empty before trying to concat
-        if not os.path.exists(clip_list_path) or os.stat(clip_list_path).st_size == 0:
+        # Ensure the concat list is not empty before trying to concat
+        if not clip_list_entries:
             print("❌ 合併列表檔案不存在或為空，跳過合併。")
             # Need to decide what to do if concat list is unexpectedly empty here
             # Probably just stop the process flow for this video.
@@ -704,16 +1584,16 @@ class VideoEditorApp:
 
         cmd_concat = [
             self.ffmpeg_path, "-f", "concat", "-safe", "0",
-            "-i", clip_list_path,
+            "-protocol_whitelist", "pipe,file",
+            "-i", "pipe:0", # Read the list from stdin instead of list.txt
             "-c:v", "copy", "-c:a", "copy",
             self.merged_video_path,
             "-y" # Overwrite output file without asking
         ]
         try:
-            # Adding creationflags=subprocess.CREATE_NO_WINDOW hides console window on Windows
-            # Use capture_output=True and text=True with encoding="utf-8" for better error handling
-            # This is called from a background thread, subprocess.run is OK.
-            process_concat = subprocess.run(cmd_concat, check=True, capture_output=True, text=True, encoding="utf-8", creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0)
+            # This is called from a background thread, blocking here is OK.
+            process_concat = self._run_ffmpeg_with_progress(cmd_concat, "合併片段", self._merged_duration, check=True,
+                                                            input="\n".join(clip_list_entries) + "\n")
             print(f"🎉 合併完成！輸出影片：{self.merged_video_path}")
 
             # Only cleanup temp clips if concatenation was successful
@@ -747,19 +1627,25 @@ class VideoEditorApp:
              return
 
         try:
-            whisper_model_name = app_config.get("whisper_model", "small")
-            print(f"✨ 使用 Whisper 模型：{whisper_model_name}")
-            model = whisper.load_model(whisper_model_name)
             print("轉錄合併後影片中，這可能需要一段時間...")
-            # Transcribe the merged video
+            # Transcribe the merged video with the same backend (faster-whisper int8 + VAD by default)
+            # and cached model as the source video
             # Use root.after for any messagebox calls from this thread
-            result = model.transcribe(self.merged_video_path, fp16=False, language="zh")
-
-            final_srt_content = ""
-            for i, segment in enumerate(result["segments"]):
-                start_td = timedelta(seconds=segment['start'])
-                end_td = timedelta(seconds=segment['end'])
-                final_srt_content += f"{i+1}\n{format_timedelta_srt(start_td)} --> {format_timedelta_srt(end_td)}\n{segment['text'].strip()}\n\n"
+            segments = None
+            if self._final_transcript is not None:
+                clip_ranges, future = self._final_transcript
+                self._final_transcript = None
+                if self._clip_ranges and clip_ranges == [tuple(clip_range) for clip_range in self._clip_ranges]:
+                    try:
+                        segments = future.result() # Usually finished while the video was being merged
+                        print("⚡ 使用預先轉錄的字幕")
+                    except Exception as e:
+                        print(f"⚠️ 預先轉錄失敗，改為轉錄合併後影片: {e}")
+            if segments is None:
+                # Decode the audio once with our FFmpeg and hand Whisper the samples, instead of letting it demux the MP4 again
+                audio = self._load_audio_16k(self.merged_video_path)
+                segments = self._ml_pool.submit(lambda: list(self._transcribe_segments(audio))).result()
+            final_srt_content = build_srt(segments)
 
             print("✅ 新字幕產生完成，準備編輯")
             # Show the subtitle editor window (needs to run in the main GUI thread)
@@ -794,8 +1680,8 @@ class VideoEditorApp:
     def prompt_final_merge(self):
         """Asks the user for confirmation before embedding subtitles."""
         if messagebox.askyesno("確認合併", "字幕編輯完成，是否將編輯後的字幕嵌入到影片中？\n\n這將需要一段時間來重新編碼影片。", icon='question'):
-            # Start embedding in a separate thread
-            threading.Thread(target=self.embed_subtitles_to_video).start()
+            # Start embedding in a background worker
+            self._submit_job(self.embed_subtitles_to_video)
         else:
             messagebox.showinfo("取消", "最終合併已取消。處理完成，但字幕未嵌入。")
             # Decide if we should quit or just go back to main window
@@ -816,37 +1702,84 @@ class VideoEditorApp:
              print(f"❌ 編輯後的字幕檔案未找到: {self.final_srt_path}")
              return
 
-
-        # FFmpeg command to embed subtitles (requires re-encoding video)
-        # Using -c:v libx264 and -preset medium is a common choice.
-        # Using forward slashes in the subtitles filter path is important for FFmpeg compatibility.
-        video_codec_flags = ["-c:v", "libx264", "-preset", "medium", "-crf", "23"] # Hardcoded, could be in config
-        audio_codec_flags = ["-c:a", "copy"]
-
-
-        cmd_embed = [
-            self.ffmpeg_path,
-            "-i", self.merged_video_path,
-            "-i", self.final_srt_path, # Input the new SRT file
-            "-vf", f"subtitles='{self.final_srt_path.replace(os.sep, '/')}'", # subtitles filter with correct path syntax
-            *video_codec_flags, # Video re-encoding flags
-            *audio_codec_flags, # Audio copy flag
-            final_output_with_subs,
-            "-y" # Overwrite output file without asking
-        ]
+        ascii_srt_path = None # Temporary ASCII-named copy of the SRT for the subtitles filter, removed at the end
+        if app_config.get("soft_subtitles", False):
+            # Soft subtitles: mux the SRT as an MP4 text track, video and audio are copied untouched (no decoding)
+            cmd_embed = [
+                self.ffmpeg_path,
+                "-i", self.merged_video_path,
+                "-i", self.final_srt_path, # Input the new SRT file
+                "-map", "0", "-map", "1:s",
+                "-c", "copy", "-c:s", "mov_text", # MP4 only supports mov_text subtitles
+                "-metadata:s:s:0", "language=chi",
+                final_output_with_subs,
+                "-y" # Overwrite output file without asking
+            ]
+        else:
+            # FFmpeg command to burn in subtitles (requires re-encoding video)
+            # A hardware encoder is used when one works, otherwise libx264.
+            # Using forward slashes in the subtitles filter path is important for FFmpeg compatibility.
+            encoder, hw_input_flags, filter_suffix, quality_flags = self._get_video_encoder()
+            video_codec_flags = ["-c:v", encoder, *quality_flags]
+            filter_srt_path = self.final_srt_path
+            if not filter_srt_path.isascii() and tempfile.gettempdir().isascii():
+                # libass/fontconfig take a slow path on (and sometimes fail to open) non-ASCII paths on Windows,
+                # so the filter reads a copy with a plain ASCII name instead
+                fd, ascii_srt_path = tempfile.mkstemp(suffix=".srt", prefix="subs_")
+                os.close(fd)
+                shutil.copyfile(self.final_srt_path, ascii_srt_path)
+                filter_srt_path = ascii_srt_path
+            # ':' separates filter options, so the drive letter colon has to be escaped
+            filter_srt_path = filter_srt_path.replace(os.sep, '/').replace(':', '\\:')
+            subtitles_filter = f"subtitles='{filter_srt_path}'{filter_suffix}" # subtitles filter with correct path syntax
+
+            # Only when the merged video's timeline is known exactly: clip_videos leaves _clip_ranges as None for
+            # segment mode and unaligned stream copy, where a frame-accurate re-cut would not match the video the
+            # subtitles were transcribed and edited against
+            if (app_config.get("burn_from_source", True) and self._clip_ranges is not None
+                    and 0 < len(self._clip_ranges) <= MAX_BURN_FROM_SOURCE_INPUTS):
+                # Cut, join and burn in one graph straight from the source: the picture is encoded once instead of
+                # twice (when the merged video was itself re-encoded) and the merged video is never decoded again.
+                # Each range is input-seeked, so only the frames around the kept ranges are decoded.
+                range_inputs = []
+                for start, end in self._clip_ranges:
+                    range_inputs += ["-ss", f"{start:.3f}", "-to", f"{end:.3f}", "-i", self.video_path]
+                concat_inputs = "".join(f"[{i}:v][{i}:a]" for i in range(len(self._clip_ranges)))
+                filter_graph = f"{concat_inputs}concat=n={len(self._clip_ranges)}:v=1:a=1[cv][a];[cv]{subtitles_filter}[v]"
+                cmd_embed = [
+                    self.ffmpeg_path,
+                    *hw_input_flags, # Hardware device setup (VA-API only)
+                    *range_inputs,
+                    "-filter_complex", filter_graph,
+                    "-map", "[v]", "-map", "[a]",
+                    *video_codec_flags, # Video re-encoding flags
+                    "-c:a", "aac", # The concat filter outputs decoded audio
+                    final_output_with_subs,
+                    "-y" # Overwrite output file without asking
+                ]
+            else:
+                audio_codec_flags = ["-c:a", "copy"]
+                cmd_embed = [
+                    self.ffmpeg_path,
+                    *hw_input_flags, # Hardware device setup (VA-API only)
+                    "-i", self.merged_video_path,
+                    "-i", self.final_srt_path, # Input the new SRT file
+                    "-vf", subtitles_filter,
+                    *video_codec_flags, # Video re-encoding flags
+                    *audio_codec_flags, # Audio copy flag
+                    final_output_with_subs,
+                    "-y" # Overwrite output file without asking
+                ]
         print("FFmpeg command:", subprocess.list2cmdline(cmd_embed)) # Print command for debugging
 
         try:
             self.root.after(0, messagebox.showinfo, "開始嵌入", "即將開始嵌入字幕，這可能需要一些時間。請稍候...")
             # Capture stdout and stderr for better error reporting
-            # Adding creationflags=subprocess.CREATE_NO_WINDOW hides console window on Windows
-            # Use capture_output=True/PIPE, text=True, and encoding="utf-8"
-            # This is called from a background thread, Popen is OK.
-            process = subprocess.Popen(cmd_embed, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, encoding="utf-8", creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0)
-
+            # This is called from a background thread, blocking here is OK.
             # Monitor progress (more advanced GUI needed for progress bar)
             # For now, just wait for it to finish
-            stdout, stderr = process.communicate()
+            process = self._run_ffmpeg_with_progress(cmd_embed, "嵌入字幕", self._merged_duration)
+            stderr = process.stderr
 
             if process.returncode != 0:
                  error_output = stderr # stderr is already text=True and decoded as utf-8
@@ -863,28 +1796,55 @@ class VideoEditorApp:
              print(f"❌ 嵌入字幕過程中發生錯誤: {e}")
              traceback.print_exc() # Print detailed error info
         finally:
+             if ascii_srt_path:
+                 _silent_unlink(ascii_srt_path)
              # Decide whether to automatically quit or stay open
              # self.root.quit() # Option to quit after final step
-             pass
 
 
+    def _get_video_encoder(self):
+        """Returns the (encoder, input flags, filter suffix, quality flags) entry to re-encode video with.
+
+        Detection runs once per FFmpeg path: an encoder listed by `ffmpeg -encoders` is only picked
+        after a tiny test encode succeeds, since builds often list encoders the machine cannot run."""
+        if app_config.get("video_encoder", "auto") != "auto":
+            return software_video_encoder()
+        if self.ffmpeg_path in self._video_encoder_cache:
+            # None means no hardware encoder works; the libx264 entry is rebuilt so setting changes apply
+            return self._video_encoder_cache[self.ffmpeg_path] or software_video_encoder()
+
+        chosen = None
+        try:
+            available = self._run_ffmpeg([self.ffmpeg_path, "-hide_banner", "-encoders"]).stdout
+            for entry in HW_VIDEO_ENCODERS:
+                encoder, hw_input_flags, filter_suffix, quality_flags = entry
+                if f" {encoder} " not in available:
+                    continue
+                test_cmd = [
+                    self.ffmpeg_path, "-hide_banner", "-loglevel", "error",
+                    *hw_input_flags,
+                    "-f", "lavfi", "-i", "color=black:s=256x256:d=0.1", # 0.1s of generated video
+                    "-vf", f"null{filter_suffix}",
+                    "-frames:v", "1", "-c:v", encoder, *quality_flags,
+                    "-f", "null", "-" # Discard the output
+                ]
+                if self._run_ffmpeg(test_cmd, capture=False).returncode == 0: # Only the exit code matters
+                    chosen = entry
+                    break
+        except Exception as e:
+            print(f"⚠️ 偵測硬體編碼器失敗，改用 libx264: {e}")
+        self._video_encoder_cache[self.ffmpeg_path] = chosen
+        chosen = chosen or software_video_encoder()
+        print(f"🎞️ 影片編碼器：{chosen[0]}")
+        return chosen
+
     def cleanup_temp_clips(self):
         """Cleans up temporary clipped video files."""
         print("🧹 清理臨時檔案中...")
         # Ensure temp_clips list is populated correctly during clipping
-        for clip in self.temp_clips:
-             if os.path.exists(clip):
-                 try:
-                     os.remove(clip)
-                 except OSError as e:
-                     print(f"⚠️ 無法刪除臨時檔案 {clip}: {e}")
-        # Also remove the concat list file
-        list_path = os.path.join(self.output_dir, "list.txt")
-        if os.path.exists(list_path):
-             try:
-                 os.remove(list_path)
-             except OSError as e:
-                 print(f"⚠️ 無法刪除臨時檔案 {list_path}: {e}")
+        # Deletes overlap on slow or antivirus-scanned disks; _silent_unlink skips files that were never created
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(_silent_unlink, self.temp_clips))
         print("🧹 清理臨時檔案完成")
 
 
@@ -606,11 +606,10 @@ class VideoEditorApp:
 
     def clip_videos(self, clip_ranges):
         clip_list_path = os.path.join(self.output_dir, "list.txt")
-        with open(clip_list_path, "w", encoding="utf-8") as list_file: pass
+        list_entries = [] # 成功的片段先收集起來，最後一次寫入 list.txt
 
         print("✂️ 開始從 Master Video 中萃取精華片段...")
         self.temp_clips = []
-        successful_clips_count = 0
 
         for i, (start, end) in enumerate(clip_ranges):
             duration = end - start
@@ -637,15 +636,15 @@ class VideoEditorApp:
             try:
                 process = subprocess.run(cmd, capture_output=True, text=True, encoding="utf-8", creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0)
                 if process.returncode == 0:
-                    with open(clip_list_path, "a", encoding="utf-8") as list_file:
-                         list_file.write(f"file '{clip_name}'\n")
-                    successful_clips_count += 1
+                    list_entries.append(f"file '{clip_name}'\n".encode("utf-8"))
                 else:
                     print(f"❌ 擷取失敗: {process.stderr}")
             except Exception as e:
                 print(f"❌ 擷取異常: {e}")
 
-        if successful_clips_count > 0:
+        if list_entries:
+            with open(clip_list_path, "wb") as list_file:
+                list_file.writelines(list_entries)
             self.concatenate_clips(clip_list_path)
         else:
             self.cleanup_temp_clips()